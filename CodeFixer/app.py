@@ -5,10 +5,32 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import io
-import json
+import orjson
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import xlsxwriter
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from data_pipeline import MenariniDataPipeline
 from visualization import DataVisualization
 
+logger = logging.getLogger(__name__)
+
+# Processed pipelines are checkpointed here, keyed by upload content hash.
+# The directory is per user; file names carry MenariniDataPipeline.STATE_VERSION
+# so checkpoints pickled from an older pipeline structure are never loaded.
+CHECKPOINT_DIR = Path(tempfile.gettempdir()) / (
+    f"menarini_cache-{os.getuid()}" if hasattr(os, 'getuid') else 'menarini_cache'
+)
+# Only the most recently used checkpoints are kept
+CHECKPOINT_MAX_FILES = 8
+
 # Configure page
 st.set_page_config(
     page_title="Menarini Asia Pacific - Data Pipeline",
@@ -54,6 +76,8 @@ def initialize_session_state():
         st.session_state.data_processed = False
     if 'uploaded_file' not in st.session_state:
         st.session_state.uploaded_file = None
+    if 'exports' not in st.session_state:
+        st.session_state.exports = {}
 
 def display_header():
     """Display application header"""
@@ -85,6 +109,7 @@ def file_upload_section():
             st.session_state.uploaded_file = uploaded_file
             st.session_state.data_processed = False
             st.session_state.pipeline = None
+            st.session_state.exports = {}
         
         col1, col2 = st.columns([2, 1])
         
@@ -98,49 +123,148 @@ def file_upload_section():
     
     return uploaded_file
 
+def _checkpoint_dir_is_private(checkpoint_dir):
+    """Only trust a real directory owned by this user and closed to everyone else"""
+    if not hasattr(os, 'getuid'):
+        return False
+    
+    try:
+        dir_stat = checkpoint_dir.lstat()
+    except OSError:
+        return False
+    
+    return (stat.S_ISDIR(dir_stat.st_mode)
+            and dir_stat.st_uid == os.getuid()
+            and not dir_stat.st_mode & 0o077)
+
+def _load_checkpoint(checkpoint_path):
+    """Load a previously processed pipeline from disk, if one exists"""
+    if not checkpoint_path.exists():
+        return None
+    
+    # Unpickling runs code, so never read from a directory others can write to
+    if not _checkpoint_dir_is_private(checkpoint_path.parent):
+        logger.warning(f"Ignoring checkpoint in unsafe directory {checkpoint_path.parent}")
+        return None
+    
+    try:
+        pipeline = pickle.loads(checkpoint_path.read_bytes())
+        os.utime(checkpoint_path)  # Mark as recently used for pruning
+        return pipeline
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+        return None
+
+def _save_checkpoint(pipeline, checkpoint_path):
+    """Persist a processed pipeline; failures only cost a re-run later"""
+    try:
+        checkpoint_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _checkpoint_dir_is_private(checkpoint_path.parent):
+            logger.warning(f"Not writing checkpoint to unsafe directory {checkpoint_path.parent}")
+            return
+        
+        # Write to a temporary file first so readers never see a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=checkpoint_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            pickle.dump(pipeline, tmp_file, protocol=5)
+        os.replace(tmp_path, checkpoint_path)
+        
+        _prune_checkpoints(checkpoint_path.parent)
+    except Exception as e:
+        logger.warning(f"Could not write checkpoint {checkpoint_path}: {e}")
+
+def _prune_checkpoints(checkpoint_dir):
+    """Delete the least recently used checkpoints beyond CHECKPOINT_MAX_FILES"""
+    checkpoints = []
+    for path in checkpoint_dir.glob('*.pkl'):
+        try:
+            checkpoints.append((path.stat().st_mtime, path))
+        except OSError:
+            continue  # Removed concurrently
+    
+    checkpoints.sort(reverse=True)
+    for _, path in checkpoints[CHECKPOINT_MAX_FILES:]:
+        path.unlink(missing_ok=True)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _run_pipeline(file_hash, _file_obj, filename):
+    """Run the full pipeline once per distinct file; keyed on the content hash"""
+    # Reuse the result of an earlier run (e.g. before a server restart)
+    checkpoint_path = CHECKPOINT_DIR / f"v{MenariniDataPipeline.STATE_VERSION}-{file_hash}.pkl"
+    pipeline = _load_checkpoint(checkpoint_path)
+    if pipeline is not None:
+        # Same content may arrive under another name; lineage shows this upload's
+        for sheet_name, sheet_info in pipeline.data_lake['bronze'].items():
+            sheet_info['source'] = filename
+            pipeline.lineage_tracker[sheet_name]['source'] = filename
+        return pipeline
+    
+    pipeline = MenariniDataPipeline()
+    
+    # Extract data
+    if not pipeline.extract_data_from_bytes(_file_obj, filename):
+        return None
+    
+    # Validate data sources
+    pipeline.validate_data_sources()
+    
+    # Perform ETL process
+    pipeline.comprehensive_etl_process()
+    
+    # Create unified data model
+    pipeline.create_unified_data_model()
+    
+    # Generate quality report
+    pipeline.assess_data_quality()
+    
+    _save_checkpoint(pipeline, checkpoint_path)
+    
+    return pipeline
+
+@st.cache_resource(max_entries=2)
+def _read_lake_frame(path, _pipeline):
+    """Read a Parquet-backed layer once; paths are unique per pipeline run"""
+    return _pipeline.load_layer_data({'path': path})
+
+def _load_gold_frame(pipeline):
+    """Unified gold frame, without re-reading Parquet on every render (treat as read-only)"""
+    gold = pipeline.data_lake['gold']['unified_model']
+    if 'data' in gold:
+        return gold['data']
+    return _read_lake_frame(gold['path'], pipeline)
+
 def process_data(uploaded_file):
     """Process uploaded data through the pipeline"""
     with st.spinner("正在处理数据，请稍候..."):
         try:
-            # Save uploaded file temporarily
-            file_bytes = uploaded_file.read()
-            
-            # Initialize pipeline
-            pipeline = MenariniDataPipeline()
+            # Hash the upload in place; the workbook is streamed from the
+            # same buffer instead of being copied out with read()
+            with uploaded_file.getbuffer() as file_view:
+                file_hash = hashlib.blake2b(file_view, digest_size=16).hexdigest()
+            uploaded_file.seek(0)
             
             # Extract data from uploaded file
             with st.expander("📊 数据提取日志", expanded=False):
                 log_container = st.empty()
                 
-                # Extract data
-                success = pipeline.extract_data_from_bytes(file_bytes, uploaded_file.name)
+                # Run pipeline (cached per file content)
+                pipeline = _run_pipeline(file_hash, uploaded_file, uploaded_file.name)
                 
-                if success:
+                if pipeline is not None:
                     log_container.success("✅ 数据提取成功")
                     
-                    # Validate data sources
-                    validation_results = pipeline.validate_data_sources()
-                    
-                    # Perform ETL process
-                    pipeline.comprehensive_etl_process()
-                    
-                    # Create unified data model
-                    pipeline.create_unified_data_model()
-                    
-                    # Generate quality report
-                    pipeline.assess_data_quality()
-                    
                     st.session_state.pipeline = pipeline
                     st.session_state.data_processed = True
+                    st.session_state.exports = {}
                     
                     st.success("🎉 数据处理完成！")
-                    st.rerun()
                 else:
                     log_container.error("❌ 数据提取失败")
                     
         except Exception as e:
             st.error(f"❌ 处理过程中出现错误: {str(e)}")
 
+@st.fragment
 def display_data_overview():
     """Display data overview and quality metrics"""
     if not st.session_state.data_processed or not st.session_state.pipeline:
@@ -183,18 +307,23 @@ def display_data_overview():
     
     # Display gold layer info
     st.subheader("🥇 业务数据层 (Gold Layer)")
-    if 'unified_model' in pipeline.data_lake['gold']:
-        unified_data = pipeline.data_lake['gold']['unified_model']['data']
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("统一数据集行数", f"{len(unified_data):,}")
-        with col2:
-            st.metric("统一数据集列数", len(unified_data.columns))
-        with col3:
-            total_qty = unified_data[[col for col in unified_data.columns if 'QTY' in col or '数量' in col]].sum().sum()
-            st.metric("总销售数量", f"{total_qty:,.0f}")
+    gold = pipeline.data_lake['gold'].get('unified_model')
+    if not gold:
+        return
+    
+    unified_data = _load_gold_frame(pipeline)
+    qty_cols = pipeline.qty_cols
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("统一数据集行数", f"{len(unified_data):,}")
+    with col2:
+        st.metric("统一数据集列数", len(unified_data.columns))
+    with col3:
+        total_qty = np.nansum(unified_data[qty_cols].to_numpy(dtype=np.float64, copy=False))
+        st.metric("总销售数量", f"{total_qty:,.0f}")
 
+@st.fragment
 def display_data_quality():
     """Display data quality assessment"""
     if not st.session_state.data_processed or not st.session_state.pipeline:
@@ -205,57 +334,80 @@ def display_data_quality():
     
     pipeline = st.session_state.pipeline
     
-    if hasattr(pipeline, 'data_quality_report') and pipeline.data_quality_report:
+    if pipeline.data_quality_report:
         # Overall quality metrics
         st.subheader("整体质量指标")
         
-        total_completeness = 0
-        total_validity = 0
-        total_consistency = 0
-        sheet_count = 0
-        
-        quality_data = []
-        
-        for sheet_name, quality_metrics in pipeline.data_quality_report.items():
-            if isinstance(quality_metrics, dict):
-                completeness = quality_metrics.get('completeness', 0)
-                validity = quality_metrics.get('validity', 0)
-                consistency = quality_metrics.get('consistency', 0)
-                
-                total_completeness += completeness
-                total_validity += validity
-                total_consistency += consistency
-                sheet_count += 1
-                
-                quality_data.append({
-                    '工作表': sheet_name,
-                    '完整性': f"{completeness:.1%}",
-                    '有效性': f"{validity:.1%}",
-                    '一致性': f"{consistency:.1%}",
-                    '整体评分': f"{(completeness + validity + consistency) / 3:.1%}"
-                })
+        sheet_reports = {
+            sheet_name: quality_metrics
+            for sheet_name, quality_metrics in pipeline.data_quality_report.items()
+            if isinstance(quality_metrics, dict)
+        }
         
-        if sheet_count > 0:
+        if sheet_reports:
+            # One row per sheet: completeness, validity, consistency
+            scores = np.array([
+                [metrics.get('completeness', 0), metrics.get('validity', 0), metrics.get('consistency', 0)]
+                for metrics in sheet_reports.values()
+            ], dtype=np.float64)
+            avg_completeness, avg_validity, avg_consistency = scores.mean(axis=0)
+            
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                avg_completeness = total_completeness / sheet_count
                 st.metric("平均完整性", f"{avg_completeness:.1%}")
             
             with col2:
-                avg_validity = total_validity / sheet_count
                 st.metric("平均有效性", f"{avg_validity:.1%}")
             
             with col3:
-                avg_consistency = total_consistency / sheet_count
                 st.metric("平均一致性", f"{avg_consistency:.1%}")
             
-            # Quality details table
+            # Quality details table; values stay numeric so columns sort correctly
+            quality_df = pd.DataFrame(scores, columns=['完整性', '有效性', '一致性'])
+            quality_df['整体评分'] = scores.mean(axis=1)
+            quality_df.insert(0, '工作表', list(sheet_reports))
+            
             st.subheader("详细质量报告")
-            st.dataframe(pd.DataFrame(quality_data), use_container_width=True)
+            st.dataframe(
+                quality_df.style.format('{:.1%}', subset=['完整性', '有效性', '一致性', '整体评分']),
+                use_container_width=True
+            )
     else:
         st.info("数据质量报告正在生成中...")
 
+@st.cache_data(show_spinner=False)
+def _build_market_pie(market_dist):
+    """Build the market distribution pie chart from aggregated counts"""
+    return px.pie(
+        values=market_dist.values,
+        names=market_dist.index,
+        title="市场类型分布"
+    )
+
+@st.cache_data(show_spinner=False)
+def _build_qty_bar(market_sales):
+    """Build the per-market sales quantity bar chart"""
+    return px.bar(
+        x=market_sales.values,
+        y=market_sales.index,
+        orientation='h',
+        title="各市场销售数量",
+        labels={'x': '销售数量', 'y': '市场类型'}
+    )
+
+@st.cache_data(show_spinner=False)
+def _build_monthly_line(time_sales, date_col, qty_col):
+    """Build the monthly sales trend line chart"""
+    return px.line(
+        time_sales,
+        x=date_col,
+        y=qty_col,
+        color='市场类型',
+        title="月度销售趋势"
+    )
+
+@st.fragment
 def display_market_analysis():
     """Display market segment analysis"""
     if not st.session_state.data_processed or not st.session_state.pipeline:
@@ -266,76 +418,68 @@ def display_market_analysis():
     
     pipeline = st.session_state.pipeline
     
-    if 'unified_model' in pipeline.data_lake['gold']:
-        unified_data = pipeline.data_lake['gold']['unified_model']['data']
+    gold = pipeline.data_lake['gold'].get('unified_model')
+    if not gold:
+        return
+    
+    # Bind hot lookups once for the whole render
+    unified_data = _load_gold_frame(pipeline)
+    qty_cols = pipeline.qty_cols
+    date_cols = pipeline.date_cols
+    market_col = unified_data[pipeline.market_col] if pipeline.market_col else None
+    
+    # Market type distribution
+    if market_col is not None:
+        st.subheader("市场类型分布")
         
-        # Market type distribution
-        if '市场类型' in unified_data.columns:
-            st.subheader("市场类型分布")
-            
-            market_dist = unified_data['市场类型'].value_counts()
-            
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                fig_pie = px.pie(
-                    values=market_dist.values,
-                    names=market_dist.index,
-                    title="市场类型分布"
-                )
-                st.plotly_chart(fig_pie, use_container_width=True)
-            
-            with col2:
-                st.dataframe(
-                    pd.DataFrame({
-                        '市场类型': market_dist.index,
-                        '记录数': market_dist.values,
-                        '占比': (market_dist.values / market_dist.sum() * 100).round(1)
-                    }),
-                    use_container_width=True
-                )
+        # Count without sorting or unused categories, then order the k-row result
+        market_dist = market_col.value_counts(sort=False)
+        market_dist = market_dist[market_dist > 0].sort_values(ascending=False)
         
-        # Sales quantity analysis by market
-        qty_cols = [col for col in unified_data.columns if 'QTY' in col or '数量' in col]
-        if qty_cols and '市场类型' in unified_data.columns:
-            st.subheader("各市场销售数量分析")
-            
-            qty_col = qty_cols[0]
-            market_sales = unified_data.groupby('市场类型')[qty_col].sum().sort_values(ascending=False)
-            
-            fig_bar = px.bar(
-                x=market_sales.values,
-                y=market_sales.index,
-                orientation='h',
-                title="各市场销售数量",
-                labels={'x': '销售数量', 'y': '市场类型'}
+        col1, col2 = st.columns([1, 1])
+        
+        with col1:
+            fig_pie = _build_market_pie(market_dist)
+            st.plotly_chart(fig_pie, use_container_width=True)
+        
+        with col2:
+            st.dataframe(
+                pd.DataFrame({
+                    '市场类型': market_dist.index,
+                    '记录数': market_dist.values,
+                    '占比': (market_dist.values / market_dist.sum() * 100).round(1)
+                }),
+                use_container_width=True
             )
-            st.plotly_chart(fig_bar, use_container_width=True)
+    
+    # Sales quantity analysis by market
+    if qty_cols and market_col is not None:
+        st.subheader("各市场销售数量分析")
         
-        # Time series analysis
-        date_cols = [col for col in unified_data.columns if any(k in col.lower() for k in ['date', '日期', 'orderdate'])]
-        if date_cols and qty_cols:
-            st.subheader("销售趋势分析")
-            
-            date_col = date_cols[0]
-            qty_col = qty_cols[0]
-            
-            # Filter valid dates
-            valid_dates = unified_data[unified_data[date_col].notna()]
-            
-            if not valid_dates.empty:
-                time_sales = valid_dates.groupby([valid_dates[date_col].dt.to_period('M'), '市场类型'])[qty_col].sum().reset_index()
-                time_sales[date_col] = time_sales[date_col].astype(str)
-                
-                fig_line = px.line(
-                    time_sales,
-                    x=date_col,
-                    y=qty_col,
-                    color='市场类型',
-                    title="月度销售趋势"
-                )
-                st.plotly_chart(fig_line, use_container_width=True)
+        qty_col = qty_cols[0]
+        market_sales = (unified_data[qty_col]
+                        .groupby(market_col, sort=False, observed=True)
+                        .sum()
+                        .sort_values(ascending=False))
+        
+        fig_bar = _build_qty_bar(market_sales)
+        st.plotly_chart(fig_bar, use_container_width=True)
+    
+    # Time series analysis
+    if date_cols and qty_cols:
+        st.subheader("销售趋势分析")
+        
+        date_col = date_cols[0]
+        qty_col = qty_cols[0]
+        
+        # Monthly aggregation is precomputed when the gold layer is built
+        time_sales = pipeline.monthly_sales
+        
+        if time_sales is not None and not time_sales.empty:
+            fig_line = _build_monthly_line(time_sales, date_col, qty_col)
+            st.plotly_chart(fig_line, use_container_width=True)
 
+@st.fragment
 def display_data_lineage():
     """Display data lineage and governance information"""
     if not st.session_state.data_processed or not st.session_state.pipeline:
@@ -349,21 +493,167 @@ def display_data_lineage():
     # Data lineage information
     st.subheader("数据血缘追踪")
     
+    if not pipeline.lineage_tracker:
+        st.info("暂无数据血缘信息")
+        return
+    
     for sheet_name, lineage_info in pipeline.lineage_tracker.items():
-        with st.expander(f"📊 {sheet_name} 数据血缘", expanded=False):
-            st.write(f"**数据源:** {lineage_info['source']}")
-            st.write(f"**提取时间:** {lineage_info['extraction_timestamp']}")
-            
-            if lineage_info['transformations']:
-                st.write("**转换步骤:**")
-                for i, transform in enumerate(lineage_info['transformations'], 1):
-                    st.write(f"{i}. {transform['step']} - {transform['timestamp']}")
-                    if 'changes' in transform:
-                        st.json(transform['changes'])
-                    if 'rules_applied' in transform:
-                        for rule in transform['rules_applied']:
-                            st.write(f"   - {rule}")
+        _lineage_block(sheet_name, lineage_info)
+
+@st.fragment
+def _lineage_block(sheet_name, lineage_info):
+    """Render one sheet's lineage; change details are only sent when toggled on"""
+    with st.expander(f"📊 {sheet_name} 数据血缘", expanded=False):
+        st.write(f"**数据源:** {lineage_info['source']}")
+        st.write(f"**提取时间:** {lineage_info['extraction_timestamp']}")
+        
+        if lineage_info['transformations']:
+            st.write("**转换步骤:**")
+            for i, transform in enumerate(lineage_info['transformations'], 1):
+                st.write(f"{i}. {transform.step} - {datetime.fromtimestamp(transform.ts)}")
+                if transform.step == 'column_name_cleaning':
+                    if transform.diff and st.toggle(f"查看详情 {i}", key=f"lineage-{sheet_name}-{i}"):
+                        st.json(dict(transform.diff))
+                else:
+                    for rule in transform.diff:
+                        st.write(f"   - {rule}")
 
+def _write_unified_xlsx(unified_data, target):
+    """
+    Write the unified dataset and a summary sheet with xlsxwriter in
+    constant-memory mode
+    
+    Rows are written strictly in order with write_row so each one can be
+    flushed as soon as it is complete; pandas' to_excel writes column by
+    column, which constant_memory mode cannot handle.
+    """
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True
+    })
+    
+    worksheet = workbook.add_worksheet('统一数据集')
+    worksheet.write_row(0, 0, [str(col) for col in unified_data.columns])
+    for row_idx, row in enumerate(unified_data.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_idx, 0, [None if pd.isna(value) else value for value in row])
+    
+    # Add summary sheet
+    summary_sheet = workbook.add_worksheet('数据摘要')
+    summary_rows = [
+        ('指标', '值'),
+        ('总记录数', len(unified_data)),
+        ('总列数', len(unified_data.columns)),
+        ('处理时间', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    ]
+    for row_idx, row in enumerate(summary_rows):
+        summary_sheet.write_row(row_idx, 0, row)
+    
+    workbook.close()
+
+def _build_csv_bytes(unified_data):
+    """Serialize the unified dataset to CSV bytes"""
+    # Arrow's C++ writer, UTF-8 BOM so Excel detects the encoding
+    csv_buffer = io.BytesIO()
+    csv_buffer.write(b'\xef\xbb\xbf')
+    pa_csv.write_csv(
+        pa.Table.from_pandas(unified_data, preserve_index=False),
+        csv_buffer,
+        write_options=pa_csv.WriteOptions(include_header=True)
+    )
+    return csv_buffer.getvalue()
+
+def _build_xlsx_bytes(unified_data):
+    """
+    Serialize the unified dataset to Excel bytes
+    
+    The workbook is assembled in a temporary file so only the finished,
+    compressed archive is ever held in memory.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        _write_unified_xlsx(unified_data, tmp_path)
+        return Path(tmp_path).read_bytes()
+    finally:
+        os.remove(tmp_path)
+
+def _build_parquet_bytes(unified_data):
+    """Serialize the unified dataset to Parquet bytes"""
+    parquet_buffer = io.BytesIO()
+    unified_data.to_parquet(parquet_buffer, engine='pyarrow', compression='zstd', index=False)
+    return parquet_buffer.getvalue()
+
+@st.fragment
+def _csv_download(pipeline):
+    """Build the CSV export only when requested"""
+    exports = st.session_state.exports
+    
+    if st.button("生成 CSV", key="build_csv"):
+        exports['csv'] = _build_csv_bytes(_load_gold_frame(pipeline))
+    
+    if 'csv' in exports:
+        st.download_button(
+            label="📥 下载 CSV 文件",
+            data=exports['csv'],
+            file_name=f"menarini_unified_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+
+@st.cache_resource
+def _get_export_executor():
+    """Background worker for slow export serialization, shared by all sessions (one job at a time)"""
+    return ThreadPoolExecutor(max_workers=1)
+
+@st.fragment(run_every=1)
+def _xlsx_progress(future):
+    """Poll a pending Excel build without blocking; rerun the page once it finishes"""
+    if future.done():
+        st.rerun()
+    st.info("⏳ 正在后台生成 Excel 文件...")
+
+@st.fragment
+def _xlsx_download(pipeline):
+    """Build the Excel export on a background thread only when requested"""
+    exports = st.session_state.exports
+    
+    if st.button("生成 Excel", key="build_xlsx"):
+        exports['xlsx'] = _get_export_executor().submit(
+            _build_xlsx_bytes, _load_gold_frame(pipeline)
+        )
+    
+    # The future outlives reruns, so navigating away doesn't restart the build
+    future = exports.get('xlsx')
+    if future is not None:
+        if not future.done():
+            _xlsx_progress(future)
+        elif future.exception() is not None:
+            st.error(f"❌ Excel 导出失败: {future.exception()}")
+        else:
+            st.download_button(
+                label="📥 下载 Excel 文件",
+                data=future.result(),
+                file_name=f"menarini_unified_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+@st.fragment
+def _parquet_download(pipeline):
+    """Build the Parquet export only when requested"""
+    exports = st.session_state.exports
+    
+    if st.button("生成 Parquet", key="build_parquet"):
+        exports['parquet'] = _build_parquet_bytes(_load_gold_frame(pipeline))
+    
+    if 'parquet' in exports:
+        st.download_button(
+            label="📥 下载 Parquet 文件",
+            data=exports['parquet'],
+            file_name=f"menarini_unified_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+            mime="application/octet-stream"
+        )
+
+@st.fragment
 def export_data_section():
     """Handle data export functionality"""
     if not st.session_state.data_processed or not st.session_state.pipeline:
@@ -379,43 +669,21 @@ def export_data_section():
     with col1:
         st.subheader("导出统一数据集")
         if 'unified_model' in pipeline.data_lake['gold']:
-            unified_data = pipeline.data_lake['gold']['unified_model']['data']
-            
-            # Export to CSV
-            csv_buffer = io.StringIO()
-            unified_data.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
+            # Each export is serialized on demand inside its own fragment
+            _csv_download(pipeline)
+            _xlsx_download(pipeline)
             
-            st.download_button(
-                label="📥 下载 CSV 文件",
-                data=csv_buffer.getvalue(),
-                file_name=f"menarini_unified_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
-            
-            # Export to Excel
-            excel_buffer = io.BytesIO()
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                unified_data.to_excel(writer, sheet_name='统一数据集', index=False)
-                
-                # Add summary sheet
-                summary_data = {
-                    '指标': ['总记录数', '总列数', '处理时间'],
-                    '值': [len(unified_data), len(unified_data.columns), datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-                }
-                pd.DataFrame(summary_data).to_excel(writer, sheet_name='数据摘要', index=False)
-            
-            st.download_button(
-                label="📥 下载 Excel 文件",
-                data=excel_buffer.getvalue(),
-                file_name=f"menarini_unified_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            # Parquet for analytical consumers
+            _parquet_download(pipeline)
     
     with col2:
         st.subheader("导出质量报告")
-        if hasattr(pipeline, 'data_quality_report') and pipeline.data_quality_report:
+        if pipeline.data_quality_report:
             # Export quality report as JSON
-            quality_json = json.dumps(pipeline.data_quality_report, indent=2, ensure_ascii=False, default=str)
+            quality_json = orjson.dumps(
+                pipeline.data_quality_report,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            )
             
             st.download_button(
                 label="📥 下载质量报告 (JSON)",
@@ -9,6 +9,22 @@ import sqlite3
 from pathlib import Path
 import warnings
 import io
+import os
+import hashlib
+import re
+import zipfile
+import time
+import uuid
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import openpyxl
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils.exceptions import InvalidFileException
+from pandas.io.parsers import TextParser
+import pyarrow as pa
+import pyarrow.parquet as pq
 warnings.filterwarnings('ignore')
 
 # Configure logging
@@ -18,6 +34,71 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Excel serial dates count days from 1899-12-30; accepted serials cover 2020-2025
+_EXCEL_EPOCH = np.datetime64('1899-12-30', 'ns')
+_EXCEL_SERIAL_MIN = (np.datetime64('2020-01-01', 'D') - np.datetime64('1899-12-30', 'D')).astype(np.int64)
+_EXCEL_SERIAL_MAX = (np.datetime64('2026-01-01', 'D') - np.datetime64('1899-12-30', 'D')).astype(np.int64)
+_NS_PER_DAY = 86_400 * 10**9
+
+# Below this many bronze cells, process-pool startup and pickling cost more than they save
+_PROCESS_POOL_MIN_CELLS = 5_000_000
+
+# Any whitespace run in a column name, line breaks included
+_COL_CLEAN = re.compile(r'\s+')
+
+def _convert_cell(cell):
+    """Convert an openpyxl cell the way pandas' openpyxl reader does"""
+    if cell.value is None:
+        return ''
+    elif cell.data_type == TYPE_ERROR:
+        return np.nan
+    elif cell.data_type == TYPE_NUMERIC:
+        # Whole-number floats become ints, as in pd.read_excel
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+# One lineage step: step name, epoch seconds, and only what changed
+# (renamed column pairs, or the business rules that fired)
+Lineage = namedtuple('Lineage', 'step ts diff')
+
+def aggregate_monthly_quantity(data, date_col, qty_col, market_col, month_col=None):
+    """
+    Sum quantity per (month, market), ordered by month then market
+    
+    Uses one bincount over a dense combined key. Months are 'YYYY-MM' strings
+    in month_col (defaults to date_col). Returns None when the date column is
+    not datetime or no row has both a date and a market type.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(data[date_col]):
+        return None
+    
+    dates = data[date_col]
+    market_codes, markets = pd.factorize(data[market_col], sort=True)
+    
+    # Rows without a date or market type are dropped, as groupby would
+    keep = dates.notna().to_numpy() & (market_codes >= 0)
+    if not keep.any():
+        return None
+    dates = dates[keep]
+    month_ordinal = ((dates.dt.year - 1970) * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
+    market_codes = market_codes[keep]
+    qty = np.nan_to_num(data[qty_col].to_numpy(dtype=np.float64, na_value=np.nan)[keep])
+    
+    n_markets = len(markets)
+    first_month = month_ordinal.min()
+    n_groups = (month_ordinal.max() - first_month + 1) * n_markets
+    group_key = (month_ordinal - first_month) * n_markets + market_codes
+    
+    totals = np.bincount(group_key, weights=qty, minlength=n_groups)
+    present = np.flatnonzero(np.bincount(group_key, minlength=n_groups))
+    
+    return pd.DataFrame({
+        month_col or date_col: pd.PeriodIndex.from_ordinals(present // n_markets + first_month, freq='M').astype(str),
+        market_col: markets[present % n_markets],
+        qty_col: totals[present]
+    })
+
 class MenariniDataPipeline:
     """
     Complete Data Pipeline Solution for Menarini Asia Pacific
@@ -29,13 +110,34 @@ class MenariniDataPipeline:
     4. Data Governance and Documentation
     """
     
+    # Bump whenever the attributes or layer formats of a processed pipeline change
+    STATE_VERSION = 4
+    
+    # Sheet-name keywords -> market type, first match wins; the last entry is the fallback
+    _MARKET_MAP = (
+        (('RX',), 'RX处方药市场'),
+        (('电子商务',), '电子商务市场'),
+        (('Device',), '医疗器械市场'),
+        (('Retail',), '零售市场'),
+        (('CSO', 'DSO'), 'CSO&DSO市场'),
+        (('非目标',), '非目标市场'),
+        ((), '其他市场')
+    )
+    
     def __init__(self, config_path=None):
         self.config = self._load_config(config_path)
         self.raw_data = {}
         self.processed_data = {}
+        # Always present (possibly empty) so callers can test truthiness directly
         self.data_quality_report = {}
         self.lineage_tracker = {}
         
+        # Key columns of the unified model, resolved once for the display layer
+        self.qty_cols = []
+        self.date_cols = []
+        self.market_col = None
+        self.monthly_sales = None
+        
         # Initialize data lake structure
         self.data_lake = {
             'bronze': {},  # Raw data
@@ -43,17 +145,29 @@ class MenariniDataPipeline:
             'gold': {}     # Business-ready data
         }
         
+        # Parquet files of this run live under their own directory in the lake
+        self._run_id = uuid.uuid4().hex
+        
         # Set up Chinese font support
         plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
         plt.rcParams['axes.unicode_minus'] = False
         
+    @classmethod
+    def _for_worker(cls, config):
+        """Bare pipeline that can only transform sheets; skips __init__ so workers leave plt.rcParams alone"""
+        worker = cls.__new__(cls)
+        worker.config = config
+        worker.lineage_tracker = {}
+        return worker
+    
     def _load_config(self, config_path):
         """Load pipeline configuration"""
         default_config = {
             'data_sources': {
                 'sales_data': 'Case Study - Data & AI Engineer.xlsx',
                 'market_segments': ['RX', '电子商务', 'Device', 'Retail', 'CSO&DSO', '非目标市场'],
-                'key_metrics': ['QTY数量', 'OrderDate订单日期', 'ItemName产品名称']
+                'key_metrics': ['QTY数量', 'OrderDate订单日期', 'ItemName产品名称'],
+                'skip_sheets': ['说明']  # Sheet-name keywords never ingested
             },
             'quality_thresholds': {
                 'completeness': 0.8,
@@ -64,6 +178,9 @@ class MenariniDataPipeline:
                 'min_order_qty': 1,
                 'valid_date_range': ['2020-01-01', '2025-12-31'],
                 'required_fields': ['ID', 'ItemName产品名称', 'QTY数量']
+            },
+            'storage': {
+                'lake_dir': None  # Parquet directory for silver/gold; None keeps them in memory
             }
         }
         return default_config
@@ -72,38 +189,113 @@ class MenariniDataPipeline:
     # 1. AUTOMATED DATA INGESTION
     # ==========================================================================
     
+    def _read_workbook(self, source):
+        """
+        Stream sheets from an Excel workbook as (sheet_name, DataFrame) pairs
+        
+        Opens the workbook once in read-only mode and feeds each sheet's rows
+        through pandas' TextParser, so header handling and type inference match
+        pd.read_excel without loading every cell object into memory.
+        Sheets matching the configured skip keywords are filtered by name
+        before any of their rows are parsed. Legacy .xls workbooks are not
+        zip containers, so they fall back to pd.read_excel (xlrd).
+        """
+        skip_sheets = self.config['data_sources']['skip_sheets']
+        
+        try:
+            wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException):
+            yield from self._read_legacy_workbook(source, skip_sheets)
+            return
+        
+        try:
+            for sheet_name in wb.sheetnames:
+                if any(k in sheet_name for k in skip_sheets):
+                    logger.info(f"Skipping sheet: {sheet_name}")
+                    continue
+                
+                ws = wb[sheet_name]
+                # Read-only iteration otherwise trusts the stored <dimension> tag, which may be wrong
+                ws.reset_dimensions()
+                
+                rows = []
+                last_row_with_data = -1
+                for row_number, row in enumerate(ws.rows):
+                    converted_row = [_convert_cell(cell) for cell in row]
+                    while converted_row and converted_row[-1] == '':
+                        converted_row.pop()  # Trim trailing empty cells
+                    if converted_row:
+                        last_row_with_data = row_number
+                    rows.append(converted_row)
+                
+                # Trim trailing empty rows and pad the rest to a common width
+                rows = rows[:last_row_with_data + 1]
+                if rows:
+                    max_width = max(len(row) for row in rows)
+                    rows = [row + [''] * (max_width - len(row)) for row in rows]
+                
+                df = TextParser(rows, header=0).read() if rows else pd.DataFrame()
+                yield sheet_name, df
+        finally:
+            wb.close()
+    
+    def _read_legacy_workbook(self, source, skip_sheets):
+        """Read a legacy .xls workbook through pandas, skipping sheets by name"""
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        
+        with pd.ExcelFile(source) as xls:
+            target_sheets = []
+            for sheet_name in xls.sheet_names:
+                if any(k in sheet_name for k in skip_sheets):
+                    logger.info(f"Skipping sheet: {sheet_name}")
+                else:
+                    target_sheets.append(sheet_name)
+            
+            yield from pd.read_excel(xls, sheet_name=target_sheets).items()
+    
+    def _load_bronze(self, source, source_name):
+        """Read every sheet from source into the bronze layer; returns the sheet count"""
+        sheet_count = 0
+        for sheet_name, df in self._read_workbook(source):
+            logger.info(f"Extracted sheet: {sheet_name} with shape {df.shape}")
+            
+            # Store in bronze layer (raw data)
+            self.data_lake['bronze'][sheet_name] = {
+                'data': df,
+                'extracted_at': datetime.now(),
+                'source': source_name,
+                'original_shape': df.shape
+            }
+            
+            # Track data lineage
+            self.lineage_tracker[sheet_name] = {
+                'source': source_name,
+                'extraction_timestamp': datetime.now(),
+                'transformations': []
+            }
+            sheet_count += 1
+        
+        return sheet_count
+    
     def extract_data_from_bytes(self, file_bytes, filename):
         """
-        Extract data from uploaded file bytes with error handling
+        Extract data from uploaded file bytes (or a binary file-like object)
+        with error handling
         """
         logger.info(f"Starting data extraction from uploaded file: {filename}")
         
         try:
-            # Create file-like object from bytes
-            file_obj = io.BytesIO(file_bytes)
-            
-            # Load all sheets
-            all_sheets = pd.read_excel(file_obj, sheet_name=None)
+            # Accept raw bytes or an already-open file-like object
+            if isinstance(file_bytes, (bytes, bytearray)):
+                file_obj = io.BytesIO(file_bytes)
+            else:
+                file_obj = file_bytes
+                file_obj.seek(0)
             
-            for sheet_name, df in all_sheets.items():
-                logger.info(f"Extracted sheet: {sheet_name} with shape {df.shape}")
-                
-                # Store in bronze layer (raw data)
-                self.data_lake['bronze'][sheet_name] = {
-                    'data': df,
-                    'extracted_at': datetime.now(),
-                    'source': filename,
-                    'original_shape': df.shape
-                }
-                
-                # Track data lineage
-                self.lineage_tracker[sheet_name] = {
-                    'source': filename,
-                    'extraction_timestamp': datetime.now(),
-                    'transformations': []
-                }
+            sheet_count = self._load_bronze(file_obj, filename)
             
-            logger.info(f"Successfully extracted {len(all_sheets)} sheets")
+            logger.info(f"Successfully extracted {sheet_count} sheets")
             return True
             
         except Exception as e:
@@ -117,28 +309,9 @@ class MenariniDataPipeline:
         logger.info(f"Starting data extraction from {file_path}")
         
         try:
-            # Load all sheets
-            all_sheets = pd.read_excel(file_path, sheet_name=None)
-            
-            for sheet_name, df in all_sheets.items():
-                logger.info(f"Extracted sheet: {sheet_name} with shape {df.shape}")
-                
-                # Store in bronze layer (raw data)
-                self.data_lake['bronze'][sheet_name] = {
-                    'data': df,
-                    'extracted_at': datetime.now(),
-                    'source': file_path,
-                    'original_shape': df.shape
-                }
-                
-                # Track data lineage
-                self.lineage_tracker[sheet_name] = {
-                    'source': file_path,
-                    'extraction_timestamp': datetime.now(),
-                    'transformations': []
-                }
+            sheet_count = self._load_bronze(file_path, file_path)
             
-            logger.info(f"Successfully extracted {len(all_sheets)} sheets")
+            logger.info(f"Successfully extracted {sheet_count} sheets")
             return True
             
         except Exception as e:
@@ -154,14 +327,28 @@ class MenariniDataPipeline:
             
             validation_results[sheet_name] = {
                 'is_empty': df.empty,
-                'has_duplicates': df.duplicated().any(),
-                'missing_data_percentage': (df.isnull().sum().sum() / (df.shape[0] * df.shape[1])) * 100,
-                'data_types': dict(df.dtypes)
+                'has_duplicates': self._count_duplicate_rows(df) > 0,
+                'missing_data_percentage': (self._fast_null_count(df) / df.size) * 100 if df.size else np.nan,
+                'schema_signature': self._schema_signature(df)  # Full dtype map lives in generate_data_dictionary
             }
         
         logger.info("Data source validation completed")
         return validation_results
     
+    def _schema_signature(self, df):
+        """Stable digest of column names and dtypes, identical across runs and processes"""
+        schema = repr([(str(col), str(dtype)) for col, dtype in zip(df.columns, df.dtypes)])
+        return hashlib.blake2b(schema.encode(), digest_size=8).hexdigest()
+    
+    def _fast_null_count(self, df):
+        """Count missing cells block by block, without building per-column sums"""
+        return sum(np.count_nonzero(pd.isna(block.values)) for block in df._mgr.blocks)
+    
+    def _count_duplicate_rows(self, df):
+        """Count repeated rows by hashing each row to a single uint64 instead of comparing full rows"""
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        return len(row_hashes) - len(np.unique(row_hashes))
+    
     # ==========================================================================
     # 2. DATA TRANSFORMATION AND ENRICHMENT
     # ==========================================================================
@@ -169,22 +356,16 @@ class MenariniDataPipeline:
     def clean_column_names(self, df, sheet_name):
         """Standardize column names"""
         original_columns = df.columns.tolist()
+        cleaned_columns = [_COL_CLEAN.sub('', str(col)) for col in original_columns]
         
-        # Clean column names
-        df.columns = (df.columns
-                     .str.strip()
-                     .str.replace(r'[\n\r]', '', regex=True)
-                     .str.replace(r'\s+', '', regex=True))
-        
-        # Track transformation
-        self.lineage_tracker[sheet_name]['transformations'].append({
-            'step': 'column_name_cleaning',
-            'timestamp': datetime.now(),
-            'changes': {
-                'before': original_columns,
-                'after': df.columns.tolist()
-            }
-        })
+        # Clean column names on a relabelled view so the caller's frame is untouched
+        df = df.set_axis(cleaned_columns, axis=1)
+        
+        # Track transformation - renamed columns only
+        renames = tuple((old, new) for old, new in zip(original_columns, cleaned_columns) if old != new)
+        self.lineage_tracker[sheet_name]['transformations'].append(
+            Lineage('column_name_cleaning', time.time(), renames)
+        )
         
         return df
     
@@ -194,7 +375,8 @@ class MenariniDataPipeline:
         # Quantity columns
         qty_cols = [col for col in df.columns if any(k in col for k in ['QTY', '数量'])]
         for col in qty_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            # Quantities are small whole counts (returns are negative); keep the narrowest integer type that fits
+            df[col] = pd.to_numeric(pd.to_numeric(df[col], errors='coerce').fillna(0), downcast='integer')
         
         # Date columns - improved handling
         date_cols = [col for col in df.columns if any(k in col.lower() for k in ['date', '日期', 'orderdate', 'reportmonth'])]
@@ -211,22 +393,20 @@ class MenariniDataPipeline:
                 
                 # Strategy 2: Handle Excel date serial numbers
                 try:
-                    numeric_dates = pd.to_numeric(df[col], errors='coerce')
-                    if numeric_dates.notna().sum() > 0:
-                        # Excel date serial number starts from 1900-01-01
-                        df[col] = pd.to_datetime('1899-12-30') + pd.to_timedelta(numeric_dates, 'D')
-                        # Validate reasonable date range
-                        mask = (df[col].dt.year >= 2020) & (df[col].dt.year <= 2025)
-                        df.loc[~mask, col] = pd.NaT
+                    serials = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+                    if not np.isnan(serials).all():
+                        # Range check and serial-to-datetime conversion in one NumPy pass
+                        in_range = (serials >= _EXCEL_SERIAL_MIN) & (serials < _EXCEL_SERIAL_MAX)
+                        offsets = np.rint(np.where(in_range, serials, 0) * _NS_PER_DAY).astype('timedelta64[ns]')
+                        df[col] = np.where(in_range, _EXCEL_EPOCH + offsets, np.datetime64('NaT', 'ns'))
                 except:
                     pass
         
-        # Text columns
-        text_cols = df.select_dtypes(include=['object']).columns
-        for col in text_cols:
-            if col not in date_cols:
-                df[col] = df[col].astype(str).str.strip()
-                df[col] = df[col].replace(['nan', 'None', ''], np.nan)
+        # Text columns - Arrow-backed strings so strip runs in Arrow's compute kernels
+        text_cols = [col for col in df.select_dtypes(include=['object', 'string']).columns if col not in date_cols]
+        if text_cols:
+            stripped = df[text_cols].astype('string[pyarrow]').apply(lambda s: s.str.strip())
+            df[text_cols] = stripped.mask(stripped.isin(['nan', 'None', '']))
         
         return df
     
@@ -241,89 +421,135 @@ class MenariniDataPipeline:
             invalid_qty_mask = df[qty_col] < self.config['business_rules']['min_order_qty']
             invalid_count = invalid_qty_mask.sum()
             if invalid_count > 0:
-                df.loc[invalid_qty_mask, qty_col] = np.nan
+                # NaN needs a float column; float32 still holds the counts exactly
+                df[qty_col] = pd.to_numeric(df[qty_col].mask(invalid_qty_mask), downcast='float')
                 rules_applied.append(f"Removed {invalid_count} records with invalid quantity")
         
         # Rule 2: Date range validation
         date_cols = [col for col in df.columns if any(k in col.lower() for k in ['date', '日期', 'orderdate'])]
         for col in date_cols:
-            if df[col].dtype == 'datetime64[ns]':
-                start_date = pd.to_datetime(self.config['business_rules']['valid_date_range'][0])
-                end_date = pd.to_datetime(self.config['business_rules']['valid_date_range'][1])
-                
-                invalid_date_mask = (df[col] < start_date) | (df[col] > end_date)
-                invalid_dates = invalid_date_mask.sum()
-                if invalid_dates > 0:
-                    df.loc[invalid_date_mask, col] = pd.NaT
-                    rules_applied.append(f"Removed {invalid_dates} records with invalid dates in {col}")
+            # Any datetime resolution or timezone; other columns are skipped before any mask is built
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                continue
+            
+            start_date = pd.Timestamp(self.config['business_rules']['valid_date_range'][0], tz=df[col].dt.tz)
+            end_date = pd.Timestamp(self.config['business_rules']['valid_date_range'][1], tz=df[col].dt.tz)
+            
+            invalid_date_mask = (df[col] < start_date) | (df[col] > end_date)
+            invalid_dates = invalid_date_mask.sum()
+            if invalid_dates > 0:
+                df.loc[invalid_date_mask, col] = pd.NaT
+                rules_applied.append(f"Removed {invalid_dates} records with invalid dates in {col}")
         
         # Track rules applied
-        self.lineage_tracker[sheet_name]['transformations'].append({
-            'step': 'business_rules_application',
-            'timestamp': datetime.now(),
-            'rules_applied': rules_applied
-        })
+        self.lineage_tracker[sheet_name]['transformations'].append(
+            Lineage('business_rules_application', time.time(), tuple(rules_applied))
+        )
         
         return df
     
     def enrich_data(self, df, sheet_name):
         """Enrich data with additional business context"""
         
-        # Add market type based on sheet name
-        if 'RX' in sheet_name:
-            df['市场类型'] = 'RX处方药市场'
-        elif '电子商务' in sheet_name:
-            df['市场类型'] = '电子商务市场'
-        elif 'Device' in sheet_name:
-            df['市场类型'] = '医疗器械市场'
-        elif 'Retail' in sheet_name:
-            df['市场类型'] = '零售市场'
-        elif 'CSO' in sheet_name or 'DSO' in sheet_name:
-            df['市场类型'] = 'CSO&DSO市场'
-        elif '非目标' in sheet_name:
-            df['市场类型'] = '非目标市场'
-        else:
-            df['市场类型'] = '其他市场'
+        # Add market type based on sheet name, resolved once per sheet and stored as int8 category codes
+        market_types = [market_type for _, market_type in self._MARKET_MAP]
+        market_type = next((market_type for keywords, market_type in self._MARKET_MAP
+                            if any(k in sheet_name for k in keywords)), '其他市场')
+        df['市场类型'] = pd.Categorical.from_codes(
+            np.full(len(df), market_types.index(market_type), dtype=np.int8),
+            categories=market_types
+        )
         
         # Add time-based features
         date_cols = [col for col in df.columns if any(k in col.lower() for k in ['date', '日期', 'orderdate'])]
-        if date_cols and df[date_cols[0]].dtype == 'datetime64[ns]':
+        if date_cols and pd.api.types.is_datetime64_any_dtype(df[date_cols[0]]):
             date_col = date_cols[0]
-            df['年份'] = df[date_col].dt.year
-            df['月份'] = df[date_col].dt.month
-            df['季度'] = df[date_col].dt.quarter
-            df['星期几'] = df[date_col].dt.dayofweek
+            dates = df[date_col]
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_localize(None)  # Features use local wall-clock time
+            
+            # Derive all four features from one datetime64 buffer with integer arithmetic
+            values = dates.to_numpy()
+            months = values.astype('datetime64[M]').astype(np.int64)
+            days = values.astype('datetime64[D]').astype(np.int64)
+            month = months % 12 + 1
+            features = np.column_stack([
+                months // 12 + 1970,   # 年份
+                month,                 # 月份
+                (month - 1) // 3 + 1,  # 季度
+                (days + 3) % 7         # 星期几, Monday=0 (1970-01-01 was a Thursday)
+            ])
+            
+            missing = np.isnat(values)
+            if missing.any():
+                features = features.astype(np.float64)
+                features[missing] = np.nan
+            else:
+                features = features.astype(np.int32)
+            df[['年份', '月份', '季度', '星期几']] = features
         
-        # Add data processing metadata
-        df['数据处理时间'] = datetime.now()
-        df['数据来源'] = sheet_name
+        # Add data processing metadata - the timestamp is frame-level, the source a one-category column
+        df.attrs['processed_at'] = datetime.now()
+        df.attrs['source'] = sheet_name
+        df['数据来源'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[sheet_name])
         
         return df
     
-    def comprehensive_etl_process(self):
-        """Execute comprehensive ETL process"""
+    def _transform_sheet(self, sheet_name, df):
+        """Run the bronze-to-silver transformations for a single sheet"""
+        logger.info(f"Processing sheet: {sheet_name}")
+        
+        # Every transform below returns a new frame, so the bronze data is never copied or mutated
+        df = self.clean_column_names(df, sheet_name)
+        notna = df.notna().to_numpy()
+        df = df.iloc[notna.any(axis=1), notna.any(axis=0)]  # Remove empty rows and columns in one pass
+        df = self.standardize_data_types(df, sheet_name)
+        df = self.apply_business_rules(df, sheet_name)
+        df = self.enrich_data(df, sheet_name)
+        
+        return df
+    
+    def comprehensive_etl_process(self, max_workers=None, use_processes=None):
+        """
+        Execute comprehensive ETL process, one worker per sheet
+        
+        Sheets go to a process pool only when it can pay for its startup and
+        pickling cost: several CPUs and a bronze layer of at least
+        _PROCESS_POOL_MIN_CELLS cells (use_processes=None). Otherwise, or with
+        use_processes=False, they run in a thread pool.
+        """
         logger.info("Starting comprehensive ETL process")
         
-        for sheet_name, sheet_info in self.data_lake['bronze'].items():
-            if '说明' in sheet_name:  # Skip explanation sheets
-                continue
-                
-            logger.info(f"Processing sheet: {sheet_name}")
-            
-            # Extract from bronze layer
-            df = sheet_info['data'].copy()
-            
-            # Transform
-            df = self.clean_column_names(df, sheet_name)
-            df = df.dropna(axis=1, how='all')  # Remove empty columns
-            df = df.dropna(axis=0, how='all')  # Remove empty rows
-            df = self.standardize_data_types(df, sheet_name)
-            df = self.apply_business_rules(df, sheet_name)
-            df = self.enrich_data(df, sheet_name)
+        # Explanation sheets are already filtered out at ingestion
+        tasks = [(self.config, sheet_name, sheet_info['data']) for sheet_name, sheet_info in self.data_lake['bronze'].items()]
+        if not tasks:
+            return
+        workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+        
+        if use_processes is None:
+            use_processes = ((os.cpu_count() or 1) > 1
+                             and sum(df.size for _, _, df in tasks) >= _PROCESS_POOL_MIN_CELLS)
+        
+        results = None
+        if use_processes and workers > 1:
+            try:
+                # Spawn fresh interpreters: forking the threaded Streamlit server is unsafe
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    results = list(executor.map(_process_one, tasks))
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"Process pool unavailable, processing sheets in threads: {e}")
+        
+        if results is None:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_process_one, tasks))
+        
+        # Merge in bronze order so lineage and the silver layer stay deterministic
+        for sheet_name, df, transformations in results:
+            self.lineage_tracker[sheet_name]['transformations'].extend(transformations)
             
             # Store in silver layer (cleaned data)
             self.data_lake['silver'][sheet_name] = {
-                'data': df,
+                **self._store_frame('silver', sheet_name, df),
                 'processed_at': datetime.now(),
                 'transformations_applied': len(self.lineage_tracker[sheet_name]['transformations']),
                 'final_shape': df.shape
@@ -339,102 +565,179 @@ class MenariniDataPipeline:
         """Create unified data model for business intelligence"""
         logger.info("Creating unified data model")
         
-        # Combine all market segments into unified model
-        unified_data = []
+        # Combine all market segments into unified model, intersecting columns as the sheets are collected
+        sources = []
         common_columns = None
         
         for sheet_name, sheet_info in self.data_lake['silver'].items():
-            if '说明' in sheet_name or '产品' in sheet_name:
+            if '产品' in sheet_name:
                 continue
-                
-            df = sheet_info['data']
             
-            # Find common columns across all sheets
-            if common_columns is None:
-                common_columns = set(df.columns)
-            else:
-                common_columns = common_columns.intersection(set(df.columns))
+            sheet_columns = set(self._stored_columns(sheet_info))
+            common_columns = sheet_columns if common_columns is None else common_columns & sheet_columns
+            sources.append((sheet_name, sheet_info))
         
         # Create unified dataset with common columns
         if common_columns:
             common_columns = list(common_columns)
             
-            for sheet_name, sheet_info in self.data_lake['silver'].items():
-                if '说明' in sheet_name or '产品' in sheet_name:
+            # Select common columns (Parquet-backed sheets read only these) and combine all data
+            frames = [self.load_layer_data(sheet_info, columns=common_columns) for _, sheet_info in sources]
+            unified_df = self._optimize_dtypes(pd.concat(self._align_dtypes(frames, common_columns), ignore_index=True))
+            
+            # Store in gold layer
+            self.data_lake['gold']['unified_model'] = {
+                **self._store_frame('gold', 'unified_model', unified_df),
+                'created_at': datetime.now(),
+                'final_shape': unified_df.shape,
+                'source_sheets': [sheet_name for sheet_name, _ in sources],
+                'common_columns': common_columns
+            }
+            
+            # Resolve key columns once so the display layer doesn't rescan names
+            self._resolve_key_columns(unified_df)
+            self.monthly_sales = self._aggregate_monthly_sales(unified_df)
+            
+            logger.info(f"Created unified data model with {len(unified_df)} records and {len(common_columns)} columns")
+        
+    def _align_dtypes(self, frames, columns):
+        """Cast each column to its common dtype up front so concat joins like-typed blocks"""
+        casts = [{} for _ in frames]
+        for col in columns:
+            dtypes = [df[col].dtype for df in frames]
+            if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                # Per-sheet categories (e.g. 数据来源) are unioned so the column stays categorical
+                categories = dtypes[0].categories.append([dtype.categories for dtype in dtypes[1:]]).unique()
+                target = pd.CategoricalDtype(categories)
+            elif all(isinstance(dtype, np.dtype) for dtype in dtypes):
+                try:
+                    target = np.result_type(*dtypes)
+                except TypeError:
                     continue
-                    
-                df = sheet_info['data']
-                
-                # Select common columns
-                df_common = df[common_columns].copy()
-                unified_data.append(df_common)
+            else:
+                # Other extension dtypes (strings) are left to concat's own rules
+                continue
+            for frame_casts, dtype in zip(casts, dtypes):
+                if dtype != target:
+                    frame_casts[col] = target
+        
+        return [df.astype(frame_casts) if frame_casts else df for df, frame_casts in zip(frames, casts)]
+    
+    def _store_frame(self, layer, name, df):
+        """Keep a layer frame in memory, or write it to Parquet when a lake directory is configured"""
+        lake_dir = self.config['storage']['lake_dir']
+        if lake_dir is None:
+            return {'data': df}
+        
+        path = Path(lake_dir) / self._run_id / layer / f"{name}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression='zstd')
+        return {'path': str(path), 'schema': table.schema}
+    
+    def _stored_columns(self, layer_info):
+        """Column names of a layer entry without reading Parquet data"""
+        if 'data' in layer_info:
+            return layer_info['data'].columns.tolist()
+        return layer_info['schema'].names
+    
+    def load_layer_data(self, layer_info, columns=None):
+        """Return the DataFrame behind a silver/gold entry, optionally only some columns"""
+        if 'data' in layer_info:
+            df = layer_info['data']
+            return df[columns] if columns is not None else df
+        return pq.read_table(layer_info['path'], columns=columns).to_pandas()
+    
+    def _resolve_key_columns(self, df):
+        """Detect quantity, date and market type columns in a single pass over the names"""
+        qty_cols = []
+        date_cols = []
+        for col in df.columns:
+            lowered = col.lower()
+            if 'QTY' in col or '数量' in col:
+                qty_cols.append(col)
+            if 'date' in lowered or '日期' in col:
+                date_cols.append(col)
+        
+        self.qty_cols = qty_cols
+        self.date_cols = date_cols
+        self.market_col = '市场类型' if '市场类型' in df.columns else None
+    
+    def _aggregate_monthly_sales(self, df):
+        """Pre-aggregate sales quantity by month and market type for the trend chart"""
+        if not self.date_cols or not self.qty_cols or self.market_col is None:
+            return None
+        
+        return aggregate_monthly_quantity(df, self.date_cols[0], self.qty_cols[0], self.market_col)
+    
+    def _optimize_dtypes(self, df):
+        """Downcast numeric columns and store low-cardinality text as categories"""
+        for col in df.columns:
+            series = df[col]
             
-            if unified_data:
-                # Combine all data
-                unified_df = pd.concat(unified_data, ignore_index=True)
-                
-                # Store in gold layer
-                self.data_lake['gold']['unified_model'] = {
-                    'data': unified_df,
-                    'created_at': datetime.now(),
-                    'source_sheets': [name for name in self.data_lake['silver'].keys() if '说明' not in name and '产品' not in name],
-                    'common_columns': common_columns
-                }
-                
-                logger.info(f"Created unified data model with {len(unified_df)} records and {len(common_columns)} columns")
+            if pd.api.types.is_bool_dtype(series):
+                continue
+            elif pd.api.types.is_integer_dtype(series):
+                df[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_float_dtype(series):
+                df[col] = pd.to_numeric(series, downcast='float')
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                if col in ('市场类型', '数据来源') or (len(df) > 0 and series.nunique() / len(df) < 0.5):
+                    df[col] = series.astype('category')
         
+        return df
+    
     # ==========================================================================
     # 4. DATA QUALITY ASSESSMENT
     # ==========================================================================
     
-    def assess_data_quality(self):
-        """Comprehensive data quality assessment"""
-        logger.info("Starting data quality assessment")
+    def _assess_sheet_quality(self, df):
+        """Compute completeness, validity and consistency for one sheet"""
+        n_rows = len(df)
+        total_cells = n_rows * df.shape[1]
         
-        for sheet_name, sheet_info in self.data_lake['silver'].items():
-            df = sheet_info['data']
-            
-            # Calculate completeness
-            total_cells = df.shape[0] * df.shape[1]
-            non_null_cells = df.notna().sum().sum()
-            completeness = non_null_cells / total_cells if total_cells > 0 else 0
-            
-            # Calculate validity (for numeric and date columns)
-            validity_scores = []
+        # One pass over the blocks: null counts feed completeness, and the
+        # per-column valid ratios of numeric and date blocks feed validity
+        null_cells = 0
+        validity_scores = []
+        for block in df._mgr.blocks:
+            nulls = np.atleast_2d(pd.isna(block.values))
+            null_cells += np.count_nonzero(nulls)
             
-            # Numeric validity
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            for col in numeric_cols:
-                if not df[col].empty:
-                    valid_count = df[col].notna().sum()
-                    total_count = len(df[col])
-                    if total_count > 0:
-                        validity_scores.append(valid_count / total_count)
-            
-            # Date validity
-            date_cols = df.select_dtypes(include=['datetime64']).columns
-            for col in date_cols:
-                if not df[col].empty:
-                    valid_count = df[col].notna().sum()
-                    total_count = len(df[col])
-                    if total_count > 0:
-                        validity_scores.append(valid_count / total_count)
-            
-            validity = np.mean(validity_scores) if validity_scores else 1.0
-            
-            # Calculate consistency (duplicate check)
-            duplicate_rate = df.duplicated().sum() / len(df) if len(df) > 0 else 0
-            consistency = 1 - duplicate_rate
+            is_numeric = pd.api.types.is_numeric_dtype(block.dtype) and not pd.api.types.is_bool_dtype(block.dtype)
+            if n_rows > 0 and (is_numeric or pd.api.types.is_datetime64_any_dtype(block.dtype)):
+                validity_scores.extend(1 - nulls.sum(axis=1) / n_rows)
+        
+        # Calculate completeness
+        completeness = (total_cells - null_cells) / total_cells if total_cells > 0 else 0
+        
+        # Calculate validity (for numeric and date columns)
+        validity = np.mean(validity_scores) if validity_scores else 1.0
+        
+        # Calculate consistency (duplicate check)
+        duplicate_rate = self._count_duplicate_rows(df) / n_rows if n_rows > 0 else 0
+        consistency = 1 - duplicate_rate
+        
+        return {
+            'completeness': completeness,
+            'validity': validity,
+            'consistency': consistency,
+            'total_records': len(df),
+            'total_columns': len(df.columns),
+            'assessment_time': datetime.now()
+        }
+    
+    def assess_data_quality(self, max_workers=None):
+        """Comprehensive data quality assessment, one worker thread per sheet"""
+        logger.info("Starting data quality assessment")
+        
+        silver = self.data_lake['silver']
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            results = executor.map(lambda info: self._assess_sheet_quality(self.load_layer_data(info)), silver.values())
             
             # Store quality metrics
-            self.data_quality_report[sheet_name] = {
-                'completeness': completeness,
-                'validity': validity,
-                'consistency': consistency,
-                'total_records': len(df),
-                'total_columns': len(df.columns),
-                'assessment_time': datetime.now()
-            }
+            for sheet_name, metrics in zip(silver, results):
+                self.data_quality_report[sheet_name] = metrics
         
         logger.info("Data quality assessment completed")
     
@@ -446,8 +749,8 @@ class MenariniDataPipeline:
             data_dictionary[layer_name] = {}
             
             for dataset_name, dataset_info in layer_data.items():
-                if 'data' in dataset_info:
-                    df = dataset_info['data']
+                if 'data' in dataset_info or 'path' in dataset_info:
+                    df = self.load_layer_data(dataset_info)
                     
                     columns_info = {}
                     for col in df.columns:
@@ -467,3 +770,13 @@ class MenariniDataPipeline:
                     }
         
         return data_dictionary
+
+def _process_one(task):
+    """Worker entry point for comprehensive_etl_process: returns the silver frame and its lineage steps"""
+    config, sheet_name, df = task
+    
+    worker = MenariniDataPipeline._for_worker(config)
+    worker.lineage_tracker[sheet_name] = {'transformations': []}
+    df = worker._transform_sheet(sheet_name, df)
+    
+    return sheet_name, df, worker.lineage_tracker[sheet_name]['transformations']
@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import streamlit as st
+from data_pipeline import aggregate_monthly_quantity
 
 class DataVisualization:
     """
@@ -22,7 +23,8 @@ class DataVisualization:
         if market_col not in data.columns:
             return None
         
-        market_dist = data[market_col].value_counts()
+        market_dist = data[market_col].value_counts(sort=False)
+        market_dist = market_dist[market_dist > 0]
         
         fig = px.pie(
             values=market_dist.values,
@@ -44,17 +46,10 @@ class DataVisualization:
         if not all(col in data.columns for col in [date_col, qty_col, market_col]):
             return None
         
-        # Filter valid dates
-        valid_data = data[data[date_col].notna()].copy()
-        
-        if valid_data.empty:
+        trend_data = aggregate_monthly_quantity(data, date_col, qty_col, market_col, month_col='年月')
+        if trend_data is None:
             return None
         
-        # Group by month and market type
-        valid_data['年月'] = valid_data[date_col].dt.to_period('M')
-        trend_data = valid_data.groupby(['年月', market_col])[qty_col].sum().reset_index()
-        trend_data['年月'] = trend_data['年月'].astype(str)
-        
         fig = px.line(
             trend_data,
             x='年月',
@@ -87,7 +82,7 @@ class DataVisualization:
             else:
                 return None
         
-        market_performance = data.groupby(market_col)[qty_col].sum().sort_values(ascending=True)
+        market_performance = data.groupby(market_col, sort=False, observed=True)[qty_col].sum().sort_values(ascending=True)
         
         fig = px.bar(
             x=market_performance.values,
@@ -113,14 +108,19 @@ class DataVisualization:
         if not quality_metrics:
             return None
         
-        # Calculate overall scores
-        completeness_scores = [metrics.get('completeness', 0) for metrics in quality_metrics.values() if isinstance(metrics, dict)]
-        validity_scores = [metrics.get('validity', 0) for metrics in quality_metrics.values() if isinstance(metrics, dict)]
-        consistency_scores = [metrics.get('consistency', 0) for metrics in quality_metrics.values() if isinstance(metrics, dict)]
+        # Calculate overall scores - running sums in a single walk over the sheets
+        sheet_count = 0
+        completeness_total = validity_total = consistency_total = 0.0
+        for metrics in quality_metrics.values():
+            if isinstance(metrics, dict):
+                completeness_total += metrics.get('completeness', 0)
+                validity_total += metrics.get('validity', 0)
+                consistency_total += metrics.get('consistency', 0)
+                sheet_count += 1
         
-        avg_completeness = np.mean(completeness_scores) if completeness_scores else 0
-        avg_validity = np.mean(validity_scores) if validity_scores else 0
-        avg_consistency = np.mean(consistency_scores) if consistency_scores else 0
+        avg_completeness = completeness_total / sheet_count if sheet_count else 0
+        avg_validity = validity_total / sheet_count if sheet_count else 0
+        avg_consistency = consistency_total / sheet_count if sheet_count else 0
         
         fig = go.Figure()
         
@@ -243,37 +243,36 @@ class DataVisualization:
         if not pipeline:
             return None
         
-        summary_data = []
+        # Build the table column by column
+        layers, sources, record_counts, column_counts, processed_times = [], [], [], [], []
+        
+        def add_row(layer, source, shape, processed_at):
+            layers.append(layer)
+            sources.append(source)
+            record_counts.append(shape[0])
+            column_counts.append(shape[1])
+            processed_times.append(processed_at.strftime('%Y-%m-%d %H:%M:%S'))
         
         # Bronze layer summary
         for sheet_name, sheet_info in pipeline.data_lake.get('bronze', {}).items():
-            summary_data.append({
-                '层级': 'Bronze (原始)',
-                '数据源': sheet_name,
-                '记录数': sheet_info['original_shape'][0],
-                '列数': sheet_info['original_shape'][1],
-                '处理时间': sheet_info['extracted_at'].strftime('%Y-%m-%d %H:%M:%S')
-            })
+            add_row('Bronze (原始)', sheet_name, sheet_info['original_shape'], sheet_info['extracted_at'])
         
         # Silver layer summary
         for sheet_name, sheet_info in pipeline.data_lake.get('silver', {}).items():
-            summary_data.append({
-                '层级': 'Silver (清洗)',
-                '数据源': sheet_name,
-                '记录数': sheet_info['final_shape'][0],
-                '列数': sheet_info['final_shape'][1],
-                '处理时间': sheet_info['processed_at'].strftime('%Y-%m-%d %H:%M:%S')
-            })
+            add_row('Silver (清洗)', sheet_name, sheet_info['final_shape'], sheet_info['processed_at'])
         
         # Gold layer summary
         if 'unified_model' in pipeline.data_lake.get('gold', {}):
             unified_info = pipeline.data_lake['gold']['unified_model']
-            summary_data.append({
-                '层级': 'Gold (业务)',
-                '数据源': 'Unified Model',
-                '记录数': len(unified_info['data']),
-                '列数': len(unified_info['data'].columns),
-                '处理时间': unified_info['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        return pd.DataFrame(summary_data) if summary_data else None
+            add_row('Gold (业务)', 'Unified Model', unified_info['final_shape'], unified_info['created_at'])
+        
+        if not layers:
+            return None
+        
+        return pd.DataFrame({
+            '层级': layers,
+            '数据源': sources,
+            '记录数': np.asarray(record_counts, dtype=np.int64),
+            '列数': np.asarray(column_counts, dtype=np.int64),
+            '处理时间': processed_times
+        })